@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from models import db, Alert, AlertStat
+from sharding import shard_router
+
+
+def hour_bucket(moment):
+    """Trunca um datetime para o início da hora"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+COUNTER_COLUMNS = ('alerts_count', 'acknowledged_count', 'ack_seconds_total')
+KEY_COLUMNS = ('bucket', 'equipment_id', 'severity', 'rule_triggered')
+
+
+def _increment(alert, **deltas):
+    """
+    Soma deltas no contador do alerta com um único upsert
+
+    Executa na transação corrente: os contadores são gravados no mesmo
+    commit que cria/reconhece o alerta. Um UPDATE seguido de INSERT não
+    serve no MySQL: o UPDATE sem linha trava o intervalo do índice único e
+    dois INSERTs concorrentes no mesmo intervalo entram em deadlock.
+    """
+    key = {
+        'bucket': hour_bucket(alert.created_at),
+        'equipment_id': alert.equipment_id,
+        'severity': alert.severity,
+        'rule_triggered': alert.rule_triggered or ''
+    }
+    table = AlertStat.__table__
+    row = {**key, **{column: deltas.get(column, 0) for column in COUNTER_COLUMNS}}
+    increments = {column: table.c[column] + delta for column, delta in deltas.items()}
+
+    dialect = db.session.get_bind(AlertStat.__mapper__).dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(table).values(**row).on_duplicate_key_update(increments)
+    elif dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table).values(**row).on_conflict_do_update(
+            index_elements=[table.c[column] for column in KEY_COLUMNS],
+            set_=increments
+        )
+    else:
+        _update_or_insert(key, row, increments)
+        return
+    db.session.execute(statement)
+
+
+def _update_or_insert(key, row, increments):
+    """Fallback para bancos sem upsert: UPDATE atômico, INSERT se não existir"""
+    values = {getattr(AlertStat, column): value for column, value in increments.items()}
+    updated = AlertStat.query.filter_by(**key).update(values, synchronize_session=False)
+    if updated:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(AlertStat(**row))
+    except IntegrityError:
+        # Outro processo criou a linha entre o UPDATE e o INSERT
+        AlertStat.query.filter_by(**key).update(values, synchronize_session=False)
+
+
+def record_alert_created(alert):
+    _increment(alert, alerts_count=1)
+
+
+def record_alert_acknowledged(alert):
+    seconds = (alert.acknowledged_at - alert.created_at).total_seconds()
+    _increment(alert, acknowledged_count=1, ack_seconds_total=seconds)
+
+
+def rebuild_alert_stats():
+    """Recalcula todos os contadores a partir da tabela de alertas (todos os shards)"""
+    return sum(rows for _, rows in shard_router.gather(_rebuild_shard))
+
+
+def _rebuild_shard():
+    AlertStat.query.delete()
+    stats = {}
+    for alert in Alert.query.yield_per(1000):
+        key = (
+            hour_bucket(alert.created_at),
+            alert.equipment_id,
+            alert.severity,
+            alert.rule_triggered or ''
+        )
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = AlertStat(
+                bucket=key[0],
+                equipment_id=key[1],
+                severity=key[2],
+                rule_triggered=key[3],
+                alerts_count=0,
+                acknowledged_count=0,
+                ack_seconds_total=0
+            )
+        stat.alerts_count += 1
+        if alert.is_acknowledged and alert.acknowledged_at:
+            stat.acknowledged_count += 1
+            stat.ack_seconds_total += (alert.acknowledged_at - alert.created_at).total_seconds()
+    db.session.add_all(stats.values())
+    db.session.commit()
+    return len(stats)
+
+
+GROUP_COLUMNS = {
+    'hour': AlertStat.bucket,
+    'severity': AlertStat.severity,
+    'rule': AlertStat.rule_triggered,
+    'equipment': AlertStat.equipment_id
+}
+
+
+def query_alert_analytics(hours=24, group_by=('hour',), equipment_id=None, severity=None):
+    """
+    Agrega os contadores no intervalo pedido
+
+    Args:
+        hours: janela de tempo (horas até agora)
+        group_by: dimensões entre 'hour', 'severity', 'rule', 'equipment'
+        equipment_id: filtra um equipamento
+        severity: filtra uma severidade
+
+    Returns:
+        lista de dicts com as dimensões, total de alertas e tempo médio de reconhecimento
+    """
+    args = (hours, group_by, equipment_id, severity)
+    if equipment_id and shard_router.enabled:
+        with shard_router.use_shard(shard_router.shard_for_equipment(equipment_id)):
+            parts = [_query_counters(*args)]
+    else:
+        parts = [rows for _, rows in shard_router.gather(_query_counters, *args)]
+
+    # Soma os contadores de todos os shards por combinação de dimensões
+    merged = {}
+    for rows in parts:
+        for dimensions, alerts_count, acknowledged_count, ack_seconds in rows:
+            totals = merged.setdefault(dimensions, [0, 0, 0.0])
+            totals[0] += alerts_count
+            totals[1] += acknowledged_count
+            totals[2] += ack_seconds
+
+    results = []
+    for dimensions in sorted(merged):
+        alerts_count, acknowledged_count, ack_seconds = merged[dimensions]
+        item = {}
+        for name, value in zip(group_by, dimensions):
+            item[name] = value.isoformat() if name == 'hour' else value
+        item['alerts_count'] = alerts_count
+        item['acknowledged_count'] = acknowledged_count
+        item['mean_time_to_acknowledge_seconds'] = (
+            ack_seconds / acknowledged_count if acknowledged_count else None
+        )
+        results.append(item)
+    return results
+
+
+def _query_counters(hours, group_by, equipment_id, severity):
+    columns = [GROUP_COLUMNS[name] for name in group_by]
+    query = db.session.query(
+        *columns,
+        db.func.sum(AlertStat.alerts_count),
+        db.func.sum(AlertStat.acknowledged_count),
+        db.func.sum(AlertStat.ack_seconds_total)
+    ).filter(AlertStat.bucket >= hour_bucket(datetime.utcnow() - timedelta(hours=hours)))
+
+    if equipment_id:
+        query = query.filter(AlertStat.equipment_id == equipment_id)
+    if severity:
+        query = query.filter(AlertStat.severity == severity)
+    if columns:
+        query = query.group_by(*columns)
+
+    return [
+        (
+            tuple(row[:len(columns)]),
+            int(row[len(columns)] or 0),
+            int(row[len(columns) + 1] or 0),
+            float(row[len(columns) + 2] or 0)
+        )
+        for row in query.all()
+    ]
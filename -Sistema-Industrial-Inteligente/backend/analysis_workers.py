@@ -0,0 +1,365 @@
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from registry import metadata_registry
+from rule_cache import rule_cache
+
+# Pontos virtuais por shard no anel de hash consistente
+VIRTUAL_NODES = 64
+
+# Tempo máximo (s) para esvaziar as filas antes de rebalancear o anel
+DRAIN_TIMEOUT = 30
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Anel de hash consistente: equipment_id -> shard"""
+
+    def __init__(self, shards, virtual_nodes=VIRTUAL_NODES):
+        self.shards = list(shards)
+        points = sorted(
+            (_hash(f'{shard}#{i}'), shard)
+            for shard in self.shards
+            for i in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._shards[index]
+
+
+def _status_of(equipment_id):
+    """(status, updated_at) do equipamento no registro deste processo"""
+    equipment = metadata_registry.get_equipment(equipment_id)
+    return (equipment.status, equipment.updated_at) if equipment is not None else None
+
+
+def _worker_main(shard_id, tasks, results, config_name):
+    """Loop de um worker: analisa snapshots na ordem em que chegam"""
+    # Import tardio: cada processo cria sua própria app/engine de banco
+    from app import create_app
+    from expert_system import analyze_equipment_data
+    from models import db
+
+    app = create_app(config_name)
+    with app.app_context():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, equipment_id, sensor_data = task
+            version = metadata_registry.version
+            status = _status_of(equipment_id)
+            try:
+                alerts_count = analyze_equipment_data(equipment_id, sensor_data)
+            except Exception as e:
+                print(f"❌ Shard {shard_id}: falha ao analisar equipamento {equipment_id}: {e}")
+                db.session.rollback()
+                alerts_count = None
+            finally:
+                db.session.remove()
+            # Avisa o processo web (ex.: status alterado pelo sistema especialista)
+            new_status = _status_of(equipment_id)
+            results.put({
+                'shard': shard_id,
+                'seq': seq,
+                'equipment_id': equipment_id,
+                'alerts_generated': alerts_count,
+                'metadata_changed': metadata_registry.version != version,
+                'status': new_status if new_status != status else None,
+                'rule_cache': rule_cache.stats()
+            })
+
+
+class AnalysisWorkerPool:
+    """
+    Pool de processos de análise particionado por equipamento
+
+    Cada equipment_id é mapeado por hash consistente para um único shard,
+    garantindo que os snapshots de um mesmo equipamento sejam analisados
+    em ordem e pelo mesmo processo.
+
+    O processo web guarda os snapshots ainda não processados de cada shard:
+    se um worker morre, ele é recriado com uma fila nova e os pendentes são
+    reenfileirados na ordem original.
+
+    Durante um rebalanceamento (resize), novos snapshots ficam em um buffer
+    e são enfileirados no anel novo após a troca: submit nunca espera.
+    """
+
+    def __init__(self, num_workers=0, config_name='default'):
+        self.num_workers = num_workers
+        self.config_name = config_name
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._workers = {}
+        self._queues = {}
+        self._pending = {}
+        self._submitted = {}
+        self._processed = {}
+        self._restarts = {}
+        self._cache_stats = {}
+        self._ring = None
+        self._resizing = False
+        self._target_ring = None
+        self._buffer = []
+        self._results = None
+        self._listeners = []
+
+    def init_app(self, app, config_name='default'):
+        app.extensions['analysis_pool'] = self
+        self.num_workers = app.config.get('ANALYSIS_WORKERS', 0)
+        self.config_name = config_name
+
+    def on_result(self, callback):
+        """Registra um callback chamado no processo web para cada análise concluída"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+        return callback
+
+    @property
+    def enabled(self):
+        return self.num_workers > 0
+
+    def submit(self, equipment_id, sensor_data):
+        """
+        Enfileira um snapshot para análise e retorna o shard escolhido
+
+        Durante um rebalanceamento o snapshot vai para o buffer e o shard
+        retornado é o do anel novo (None se o pool está sendo desligado).
+        """
+        with self._lock:
+            if self._resizing:
+                self._buffer.append((equipment_id, dict(sensor_data)))
+                return self._target_ring.shard_for(equipment_id) if self._target_ring else None
+            if self._ring is None:
+                self._start(self.num_workers)
+            return self._enqueue(equipment_id, dict(sensor_data))
+
+    def resize(self, num_workers, timeout=DRAIN_TIMEOUT):
+        """
+        Altera o número de workers e rebalanceia o anel
+
+        Os snapshots pendentes são processados antes da troca do anel, para
+        que equipamentos que mudam de shard não sejam analisados fora de
+        ordem. A espera não segura o lock do pool: envios feitos nesse meio
+        tempo vão para o buffer e seguem para o anel novo após a troca.
+
+        Returns:
+            False se as filas não esvaziaram em timeout segundos ou se já há
+            um rebalanceamento em andamento (nada muda)
+        """
+        with self._lock:
+            if self._ring is None:
+                self.num_workers = num_workers
+                return True
+            if self._resizing:
+                return False
+            self._resizing = True
+            self._target_ring = HashRing(range(num_workers)) if num_workers > 0 else None
+
+        deadline = time.monotonic() + timeout
+        stopped = []
+        try:
+            while True:
+                drained = self._drain(deadline)
+                with self._lock:
+                    if not drained:
+                        print(f"⚠️ Filas de análise não esvaziaram em {timeout}s, "
+                              f"mantendo {self.num_workers} workers")
+                        self._flush_buffer()
+                        return False
+                    if num_workers == 0 and self._buffer:
+                        # Sem anel novo: o buffer vai para os workers atuais e espera de novo
+                        self._flush_buffer()
+                        continue
+                    self.num_workers = num_workers
+                    stopped = [self._detach_shard(s) for s in list(self._workers) if s >= num_workers]
+                    if num_workers > 0:
+                        self._start(num_workers)
+                    else:
+                        self._ring = None
+                    self._flush_buffer()
+                    return True
+        finally:
+            with self._lock:
+                self._resizing = False
+                self._target_ring = None
+            for worker, tasks in stopped:
+                self._stop_process(worker, tasks)
+
+    def shutdown(self):
+        with self._lock:
+            stopped = [self._detach_shard(shard) for shard in list(self._workers)]
+            self._ring = None
+        for worker, tasks in stopped:
+            self._stop_process(worker, tasks)
+
+    def metrics(self):
+        """Profundidade de fila e total enfileirado por shard"""
+        with self._lock:
+            snapshot = [
+                (shard, self._submitted[shard], self._processed[shard],
+                 self._restarts[shard], self._workers[shard])
+                for shard in sorted(self._queues)
+            ]
+        shards = []
+        for shard, submitted, processed, restarts, worker in snapshot:
+            with self._pending_lock:
+                pending = len(self._pending.get(shard, ()))
+            shards.append({
+                'shard': shard,
+                'queue_depth': pending,
+                'submitted': submitted,
+                'processed': processed,
+                'restarts': restarts,
+                'rule_cache': self._cache_stats.get(shard),
+                'alive': worker.is_alive()
+            })
+        return {
+            'workers': self.num_workers,
+            'resizing': self._resizing,
+            'buffered': len(self._buffer),
+            'shards': shards
+        }
+
+    # ==================== INTERNOS ====================
+
+    def _enqueue(self, equipment_id, sensor_data):
+        """Envia um snapshot ao shard do anel atual (chamar com o lock)"""
+        shard = self._ring.shard_for(equipment_id)
+        if not self._workers[shard].is_alive():
+            self._respawn(shard)
+        task = (next(self._seq), equipment_id, sensor_data)
+        with self._pending_lock:
+            self._pending[shard][task[0]] = task
+        self._queues[shard].put(task)
+        self._submitted[shard] += 1
+        return shard
+
+    def _flush_buffer(self):
+        """Enfileira, em ordem, os snapshots recebidos durante o rebalanceamento"""
+        for equipment_id, sensor_data in self._buffer:
+            self._enqueue(equipment_id, sensor_data)
+        self._buffer.clear()
+
+    def _start(self, num_workers):
+        if self._results is None:
+            self._results = self._ctx.Queue()
+            threading.Thread(
+                target=self._consume_results,
+                args=(self._results,),
+                name='analysis-results',
+                daemon=True
+            ).start()
+        for shard in range(num_workers):
+            worker = self._workers.get(shard)
+            if worker is None:
+                self._queues[shard] = self._ctx.Queue()
+                self._workers[shard] = self._spawn(shard)
+                self._submitted[shard] = 0
+                self._restarts[shard] = 0
+                with self._pending_lock:
+                    self._pending[shard] = OrderedDict()
+                    self._processed[shard] = 0
+            elif not worker.is_alive():
+                self._respawn(shard)
+        self._ring = HashRing(range(num_workers))
+
+    def _spawn(self, shard):
+        worker = self._ctx.Process(
+            target=_worker_main,
+            args=(shard, self._queues[shard], self._results, self.config_name),
+            name=f'analysis-shard-{shard}',
+            daemon=True
+        )
+        worker.start()
+        return worker
+
+    def _respawn(self, shard):
+        """Recria um worker morto com fila nova e reenfileira seus pendentes"""
+        # A fila antiga pode ter ficado com o lock de leitura preso pelo processo morto
+        old = self._queues[shard]
+        old.cancel_join_thread()
+        old.close()
+        self._queues[shard] = self._ctx.Queue()
+        with self._pending_lock:
+            pending = list(self._pending[shard].values())
+        for task in pending:
+            self._queues[shard].put(task)
+        print(f"⚠️ Worker de análise {shard} morreu (código "
+              f"{self._workers[shard].exitcode}), recriando com {len(pending)} pendentes")
+        self._workers[shard] = self._spawn(shard)
+        self._restarts[shard] += 1
+
+    def _drain(self, deadline):
+        """Espera os pendentes de todos os shards serem processados (sem o lock do pool)"""
+        while True:
+            with self._pending_lock:
+                busy = [shard for shard, pending in self._pending.items() if pending]
+            if not busy:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            with self._lock:
+                for shard in busy:
+                    if not self._workers[shard].is_alive():
+                        self._respawn(shard)
+            time.sleep(0.05)
+
+    def _detach_shard(self, shard):
+        """Remove o shard do pool (chamar com o lock); o processo é parado depois"""
+        worker = self._workers.pop(shard)
+        tasks = self._queues.pop(shard)
+        del self._submitted[shard]
+        del self._restarts[shard]
+        with self._pending_lock:
+            del self._pending[shard]
+            del self._processed[shard]
+            self._cache_stats.pop(shard, None)
+        return worker, tasks
+
+    @staticmethod
+    def _stop_process(worker, tasks):
+        if worker.is_alive():
+            tasks.put(None)
+            worker.join(5)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        tasks.cancel_join_thread()
+        tasks.close()
+
+    def _consume_results(self, results):
+        while True:
+            result = results.get()
+            shard = result['shard']
+            with self._pending_lock:
+                pending = self._pending.get(shard)
+                if pending is not None:
+                    pending.pop(result['seq'], None)
+                    self._processed[shard] += 1
+                    self._cache_stats[shard] = result['rule_cache']
+            if result['metadata_changed']:
+                metadata_registry.invalidate()
+            elif result['status'] is not None:
+                metadata_registry.patch_status(result['equipment_id'], *result['status'])
+            for callback in self._listeners:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"❌ Falha ao processar resultado de análise: {e}")
+
+
+analysis_pool = AnalysisWorkerPool()
@@ -1,8 +1,14 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from models import db, Equipment, Sensor, SensorReading, Alert, MaintenanceRecord, KnowledgeRule
-from expert_system import analyze_equipment_data
-from config import config
+from models import db, Equipment, Sensor, SensorReading, Alert, MaintenanceRecord, KnowledgeRule, MaintenancePrediction, EquipmentShard
+from alert_analytics import record_alert_acknowledged, rebuild_alert_stats, query_alert_analytics, GROUP_COLUMNS
+from registry import metadata_registry
+from analysis_workers import analysis_pool
+from rule_cache import rule_cache
+from response_cache import response_cache
+from sharding import shard_router
+from predictive_maintenance import refresh_predictions
+from config import config, engine_options
 from datetime import datetime, timedelta
 import random
 import os
@@ -10,9 +16,19 @@ import os
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        app.config['DB_POOL_SIZE']
+    ))
     
-    # Inicializar extensões
+    # Inicializar extensões (shards antes do db: registram os binds)
+    shard_router.init_app(app)
     db.init_app(app)
+    metadata_registry.init_app(app)
+    analysis_pool.init_app(app, config_name)
+    rule_cache.init_app(app)
+    response_cache.init_app(app)
+    analysis_pool.on_result(response_cache.on_analysis_result)
     CORS(app)
     
     # ==================== ROTAS API ====================
@@ -22,153 +38,174 @@ def create_app(config_name='default'):
         """Health check"""
         return jsonify({'status': 'ok', 'timestamp': datetime.utcnow().isoformat()})
     
+    def _dashboard_shard():
+        """Dados do dashboard de um shard (já serializados)"""
+        total_equipments = Equipment.query.count()
+        active_alerts = Alert.query.filter_by(is_acknowledged=False).count()
+        critical_alerts = Alert.query.filter_by(
+            severity='critical',
+            is_acknowledged=False
+        ).count()
+        
+        # Equipamentos por status
+        equipment_status = db.session.query(
+            Equipment.status,
+            db.func.count(Equipment.id)
+        ).group_by(Equipment.status).all()
+        
+        # Alertas recentes (últimos 15)
+        recent_alerts = Alert.query.order_by(
+            Alert.created_at.desc()
+        ).limit(15).all()
+        
+        # Todos os equipamentos
+        equipments = Equipment.query.all()
+        
+        return {
+            'total_equipments': total_equipments,
+            'active_alerts': active_alerts,
+            'critical_alerts': critical_alerts,
+            'equipment_status': equipment_status,
+            'recent_alerts': [
+                {
+                    'id': alert.id,
+                    'equipment_id': alert.equipment_id,
+                    'equipment_name': alert.equipment.name,
+                    'severity': alert.severity,
+                    'title': alert.title,
+                    'description': alert.description,
+                    'is_acknowledged': alert.is_acknowledged,
+                    'created_at': alert.created_at.isoformat(),
+                    'shard': shard_router.current
+                }
+                for alert in recent_alerts
+            ],
+            'equipments': [
+                {
+                    'id': eq.id,
+                    'name': eq.name,
+                    'type': eq.type,
+                    'status': eq.status,
+                    'location': eq.location,
+                    'sensors_count': eq.sensors.count(),
+                    'active_alerts': eq.alerts.filter_by(is_acknowledged=False).count()
+                }
+                for eq in equipments
+            ]
+        }
+    
     @app.route('/api/dashboard')
     def dashboard_data():
-        """Dados do dashboard principal"""
+        """Dados do dashboard principal (scatter-gather entre shards)"""
         try:
-            total_equipments = Equipment.query.count()
-            active_alerts = Alert.query.filter_by(is_acknowledged=False).count()
-            critical_alerts = Alert.query.filter_by(
-                severity='critical',
-                is_acknowledged=False
-            ).count()
+            parts = [part for _, part in shard_router.gather(_dashboard_shard)]
             
-            # Equipamentos por status
-            equipment_status = db.session.query(
-                Equipment.status,
-                db.func.count(Equipment.id)
-            ).group_by(Equipment.status).all()
+            equipment_status = {}
+            for part in parts:
+                for status, count in part['equipment_status']:
+                    equipment_status[status] = equipment_status.get(status, 0) + count
             
-            # Alertas recentes (últimos 15)
-            recent_alerts = Alert.query.order_by(
-                Alert.created_at.desc()
-            ).limit(15).all()
-            
-            # Todos os equipamentos
-            equipments = Equipment.query.all()
+            recent_alerts = sorted(
+                (alert for part in parts for alert in part['recent_alerts']),
+                key=lambda alert: alert['created_at'],
+                reverse=True
+            )[:15]
             
             return jsonify({
                 'summary': {
-                    'total_equipments': total_equipments,
-                    'active_alerts': active_alerts,
-                    'critical_alerts': critical_alerts,
+                    'total_equipments': sum(part['total_equipments'] for part in parts),
+                    'active_alerts': sum(part['active_alerts'] for part in parts),
+                    'critical_alerts': sum(part['critical_alerts'] for part in parts),
                     'equipment_status': [
                         {'status': status, 'count': count}
-                        for status, count in equipment_status
+                        for status, count in equipment_status.items()
                     ]
                 },
-                'recent_alerts': [
-                    {
-                        'id': alert.id,
-                        'equipment_id': alert.equipment_id,
-                        'equipment_name': alert.equipment.name,
-                        'severity': alert.severity,
-                        'title': alert.title,
-                        'description': alert.description,
-                        'is_acknowledged': alert.is_acknowledged,
-                        'created_at': alert.created_at.isoformat()
-                    }
-                    for alert in recent_alerts
-                ],
-                'equipments': [
-                    {
-                        'id': eq.id,
-                        'name': eq.name,
-                        'type': eq.type,
-                        'status': eq.status,
-                        'location': eq.location,
-                        'sensors_count': eq.sensors.count(),
-                        'active_alerts': eq.alerts.filter_by(is_acknowledged=False).count()
-                    }
-                    for eq in equipments
-                ]
+                'recent_alerts': recent_alerts,
+                'equipments': sorted(
+                    (eq for part in parts for eq in part['equipments']),
+                    key=lambda eq: eq['id']
+                )
             })
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    def _equipment_details_body(equipment_id):
+        """Monta o JSON de detalhes de um equipamento"""
+        equipment = metadata_registry.get_equipment_or_404(equipment_id)
+        sensor_types = {sensor.id: sensor.sensor_type for sensor in equipment.sensors}
+        
+        # Últimas leituras (últimas 24 horas)
+        last_24h = datetime.utcnow() - timedelta(hours=24)
+        readings = SensorReading.query.filter(
+            SensorReading.equipment_id == equipment_id,
+            SensorReading.timestamp >= last_24h
+        ).order_by(SensorReading.timestamp.asc()).all()
+        
+        # Agrupar por tipo de sensor
+        readings_by_sensor = {}
+        for reading in readings:
+            sensor_type = sensor_types.get(reading.sensor_id)
+            if sensor_type is None:
+                sensor_type = reading.sensor.sensor_type
+            if sensor_type not in readings_by_sensor:
+                readings_by_sensor[sensor_type] = []
+            readings_by_sensor[sensor_type].append({
+                'value': float(reading.value),
+                'timestamp': reading.timestamp.isoformat(),
+                'is_anomaly': reading.is_anomaly
+            })
+        
+        # Alertas do equipamento (últimos 30)
+        alerts = Alert.query.filter_by(
+            equipment_id=equipment_id
+        ).order_by(Alert.created_at.desc()).limit(30).all()
+        
+        # Manutenções
+        maintenance_records = MaintenanceRecord.query.filter_by(
+            equipment_id=equipment_id
+        ).order_by(MaintenanceRecord.created_at.desc()).limit(10).all()
+        
+        return jsonify({
+            'equipment': equipment.to_dict(),
+            'sensors': [sensor.to_dict() for sensor in equipment.sensors],
+            'readings': readings_by_sensor,
+            'alerts': [
+                {
+                    'id': alert.id,
+                    'severity': alert.severity,
+                    'title': alert.title,
+                    'description': alert.description,
+                    'rule_triggered': alert.rule_triggered,
+                    'is_acknowledged': alert.is_acknowledged,
+                    'acknowledged_by': alert.acknowledged_by,
+                    'created_at': alert.created_at.isoformat()
+                }
+                for alert in alerts
+            ],
+            'maintenance': [
+                {
+                    'id': record.id,
+                    'type': record.maintenance_type,
+                    'description': record.description,
+                    'technician': record.technician,
+                    'status': record.status,
+                    'completed_date': record.completed_date.isoformat() if record.completed_date else None
+                }
+                for record in maintenance_records
+            ]
+        }).get_data()
+    
     @app.route('/api/equipment/<int:equipment_id>')
     def equipment_details(equipment_id):
-        """Detalhes completos de um equipamento"""
+        """Detalhes completos de um equipamento (cache por equipamento)"""
         try:
-            equipment = Equipment.query.get_or_404(equipment_id)
-            
-            # Últimas leituras (últimas 24 horas)
-            last_24h = datetime.utcnow() - timedelta(hours=24)
-            readings = SensorReading.query.filter(
-                SensorReading.equipment_id == equipment_id,
-                SensorReading.timestamp >= last_24h
-            ).order_by(SensorReading.timestamp.asc()).all()
-            
-            # Agrupar por tipo de sensor
-            readings_by_sensor = {}
-            for reading in readings:
-                sensor_type = reading.sensor.sensor_type
-                if sensor_type not in readings_by_sensor:
-                    readings_by_sensor[sensor_type] = []
-                readings_by_sensor[sensor_type].append({
-                    'value': float(reading.value),
-                    'timestamp': reading.timestamp.isoformat(),
-                    'is_anomaly': reading.is_anomaly
-                })
-            
-            # Alertas do equipamento (últimos 30)
-            alerts = Alert.query.filter_by(
-                equipment_id=equipment_id
-            ).order_by(Alert.created_at.desc()).limit(30).all()
-            
-            # Manutenções
-            maintenance_records = MaintenanceRecord.query.filter_by(
-                equipment_id=equipment_id
-            ).order_by(MaintenanceRecord.created_at.desc()).limit(10).all()
-            
-            return jsonify({
-                'equipment': {
-                    'id': equipment.id,
-                    'name': equipment.name,
-                    'type': equipment.type,
-                    'location': equipment.location,
-                    'status': equipment.status,
-                    'created_at': equipment.created_at.isoformat(),
-                    'updated_at': equipment.updated_at.isoformat()
-                },
-                'sensors': [
-                    {
-                        'id': sensor.id,
-                        'type': sensor.sensor_type,
-                        'unit': sensor.unit,
-                        'min_threshold': float(sensor.min_threshold) if sensor.min_threshold else None,
-                        'max_threshold': float(sensor.max_threshold) if sensor.max_threshold else None,
-                        'is_active': sensor.is_active,
-                        'mqtt_topic': sensor.mqtt_topic
-                    }
-                    for sensor in equipment.sensors
-                ],
-                'readings': readings_by_sensor,
-                'alerts': [
-                    {
-                        'id': alert.id,
-                        'severity': alert.severity,
-                        'title': alert.title,
-                        'description': alert.description,
-                        'rule_triggered': alert.rule_triggered,
-                        'is_acknowledged': alert.is_acknowledged,
-                        'acknowledged_by': alert.acknowledged_by,
-                        'created_at': alert.created_at.isoformat()
-                    }
-                    for alert in alerts
-                ],
-                'maintenance': [
-                    {
-                        'id': record.id,
-                        'type': record.maintenance_type,
-                        'description': record.description,
-                        'technician': record.technician,
-                        'status': record.status,
-                        'completed_date': record.completed_date.isoformat() if record.completed_date else None
-                    }
-                    for record in maintenance_records
-                ]
-            })
+            body = response_cache.get_or_build(
+                equipment_id,
+                request.args,
+                lambda: _equipment_details_body(equipment_id)
+            )
+            return app.response_class(body, mimetype=app.json.mimetype)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -176,8 +213,8 @@ def create_app(config_name='default'):
     def equipment_sensors(equipment_id):
         """Lista de sensores de um equipamento"""
         try:
-            equipment = Equipment.query.get_or_404(equipment_id)
-            sensors = equipment.sensors.all()
+            equipment = metadata_registry.get_equipment_or_404(equipment_id)
+            sensors = equipment.sensors
             
             return jsonify({
                 'equipment_id': equipment_id,
@@ -188,8 +225,8 @@ def create_app(config_name='default'):
                         'type': sensor.sensor_type,
                         'unit': sensor.unit,
                         'is_active': sensor.is_active,
-                        'min_threshold': float(sensor.min_threshold) if sensor.min_threshold else None,
-                        'max_threshold': float(sensor.max_threshold) if sensor.max_threshold else None
+                        'min_threshold': sensor.min_threshold,
+                        'max_threshold': sensor.max_threshold
                     }
                     for sensor in sensors
                 ]
@@ -207,24 +244,24 @@ def create_app(config_name='default'):
             equipment_id = request.args.get('equipment_id', type=int)
             limit = request.args.get('limit', 50, type=int)
             
-            query = Alert.query
-            
-            # Aplicar filtros
-            if acknowledged == 'true':
-                query = query.filter_by(is_acknowledged=True)
-            elif acknowledged == 'false':
-                query = query.filter_by(is_acknowledged=False)
-            
-            if severity:
-                query = query.filter_by(severity=severity)
-            
-            if equipment_id:
-                query = query.filter_by(equipment_id=equipment_id)
-            
-            alerts = query.order_by(Alert.created_at.desc()).limit(limit).all()
-            
-            return jsonify({
-                'alerts': [
+            def _alerts_shard():
+                query = Alert.query
+                
+                # Aplicar filtros
+                if acknowledged == 'true':
+                    query = query.filter_by(is_acknowledged=True)
+                elif acknowledged == 'false':
+                    query = query.filter_by(is_acknowledged=False)
+                
+                if severity:
+                    query = query.filter_by(severity=severity)
+                
+                if equipment_id:
+                    query = query.filter_by(equipment_id=equipment_id)
+                
+                alerts = query.order_by(Alert.created_at.desc()).limit(limit).all()
+                
+                return [
                     {
                         'id': alert.id,
                         'equipment_id': alert.equipment_id,
@@ -236,10 +273,26 @@ def create_app(config_name='default'):
                         'is_acknowledged': alert.is_acknowledged,
                         'acknowledged_by': alert.acknowledged_by,
                         'acknowledged_at': alert.acknowledged_at.isoformat() if alert.acknowledged_at else None,
-                        'created_at': alert.created_at.isoformat()
+                        'created_at': alert.created_at.isoformat(),
+                        'shard': shard_router.current
                     }
                     for alert in alerts
-                ],
+                ]
+            
+            # Filtro por equipamento vai direto ao shard dono; senão scatter-gather
+            if equipment_id and shard_router.enabled:
+                with shard_router.use_shard(shard_router.shard_for_equipment(equipment_id)):
+                    alerts = _alerts_shard()
+            else:
+                alerts = [
+                    alert
+                    for _, part in shard_router.gather(_alerts_shard)
+                    for alert in part
+                ]
+            alerts = sorted(alerts, key=lambda alert: alert['created_at'], reverse=True)[:limit]
+            
+            return jsonify({
+                'alerts': alerts,
                 'count': len(alerts)
             })
         except Exception as e:
@@ -249,14 +302,42 @@ def create_app(config_name='default'):
     def acknowledge_alert(alert_id):
         """Reconhecer um alerta"""
         try:
-            alert = Alert.query.get_or_404(alert_id)
             data = request.get_json() or {}
             
-            alert.is_acknowledged = True
-            alert.acknowledged_by = data.get('user', 'Sistema')
-            alert.acknowledged_at = datetime.utcnow()
+            # Ids de alertas são locais ao shard: usa o shard informado pelo cliente
+            shard = data.get('shard') or request.args.get('shard')
+            if shard and shard not in shard_router.shards:
+                return jsonify({'error': f'Shard desconhecido: {shard}'}), 400
+            if shard_router.enabled and not shard:
+                owners = [
+                    name for name, found in shard_router.gather(
+                        lambda: db.session.get(Alert, alert_id) is not None
+                    )
+                    if found
+                ]
+                if len(owners) > 1:
+                    return jsonify({'error': 'Alerta ambíguo entre plantas, informe o shard'}), 409
+                shard = owners[0] if owners else None
             
-            db.session.commit()
+            with shard_router.use_shard(shard):
+                alert = Alert.query.get_or_404(alert_id)
+                
+                # Reconhecer de novo não altera o histórico nem os contadores
+                if alert.is_acknowledged:
+                    return jsonify({
+                        'success': True,
+                        'message': 'Alerta já reconhecido',
+                        'alert_id': alert_id,
+                        'acknowledged_by': alert.acknowledged_by,
+                        'acknowledged_at': alert.acknowledged_at.isoformat() if alert.acknowledged_at else None
+                    })
+                
+                alert.is_acknowledged = True
+                alert.acknowledged_by = data.get('user', 'Sistema')
+                alert.acknowledged_at = datetime.utcnow()
+                record_alert_acknowledged(alert)
+                
+                db.session.commit()
             
             return jsonify({
                 'success': True,
@@ -267,12 +348,114 @@ def create_app(config_name='default'):
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/analytics/alerts')
+    def alert_analytics():
+        """Estatísticas de alertas a partir dos contadores pré-agregados"""
+        try:
+            hours = request.args.get('hours', 24, type=int)
+            group_by = [
+                name for name in request.args.get('group_by', 'hour').split(',')
+                if name
+            ]
+            invalid = [name for name in group_by if name not in GROUP_COLUMNS]
+            if invalid:
+                return jsonify({
+                    'error': f'Dimensão inválida: {", ".join(invalid)}',
+                    'valid_dimensions': list(GROUP_COLUMNS)
+                }), 400
+            
+            results = query_alert_analytics(
+                hours=hours,
+                group_by=group_by,
+                equipment_id=request.args.get('equipment_id', type=int),
+                severity=request.args.get('severity', type=str)
+            )
+            
+            return jsonify({
+                'hours': hours,
+                'group_by': group_by,
+                'results': results,
+                'count': len(results)
+            })
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/analytics/alerts/rebuild', methods=['POST'])
+    def rebuild_alert_analytics():
+        """Recalcula os contadores de alertas a partir do histórico"""
+        try:
+            rows = rebuild_alert_stats()
+            return jsonify({'success': True, 'counters': rows})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/maintenance/predictions')
+    def maintenance_predictions():
+        """Ranking de equipamentos por risco de manutenção (pré-calculado)"""
+        try:
+            limit = request.args.get('limit', 50, type=int)
+            min_risk = request.args.get('min_risk', type=float)
+            
+            def _predictions_shard():
+                query = db.session.query(MaintenancePrediction, Equipment.name).join(
+                    Equipment, Equipment.id == MaintenancePrediction.equipment_id
+                )
+                if min_risk is not None:
+                    query = query.filter(MaintenancePrediction.risk_score >= min_risk)
+                
+                rows = query.order_by(
+                    MaintenancePrediction.risk_score.desc(),
+                    MaintenancePrediction.remaining_useful_life.asc()
+                ).limit(limit).all()
+                
+                return [
+                    {
+                        'equipment_id': prediction.equipment_id,
+                        'equipment_name': name,
+                        'risk_score': prediction.risk_score,
+                        'remaining_useful_life': prediction.remaining_useful_life,
+                        'next_maintenance_due': prediction.next_maintenance_due.isoformat() if prediction.next_maintenance_due else None,
+                        'runtime_since_maintenance': prediction.runtime_since_maintenance,
+                        'maintenance_interval': prediction.maintenance_interval,
+                        'temperature_trend': prediction.temperature_trend,
+                        'vibration_trend': prediction.vibration_trend,
+                        'corrective_count': prediction.corrective_count,
+                        'last_maintenance_date': prediction.last_maintenance_date.isoformat() if prediction.last_maintenance_date else None,
+                        'computed_at': prediction.computed_at.isoformat() if prediction.computed_at else None
+                    }
+                    for prediction, name in rows
+                ]
+            
+            # Ranking global: junta o top de cada shard
+            predictions = sorted(
+                (item for _, part in shard_router.gather(_predictions_shard) for item in part),
+                key=lambda item: (-item['risk_score'], item['remaining_useful_life'])
+            )[:limit]
+            
+            return jsonify({
+                'predictions': predictions,
+                'count': len(predictions)
+            })
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/maintenance/predictions/refresh', methods=['POST'])
+    def refresh_maintenance_predictions():
+        """Recalcula as previsões de manutenção imediatamente"""
+        try:
+            count = refresh_predictions()
+            return jsonify({'success': True, 'equipments_scored': count})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+    
     @app.route('/api/equipment/<int:equipment_id>/simulate', methods=['POST'])
     def simulate_readings(equipment_id):
         """Simular leituras de sensores e análise"""
         try:
-            equipment = Equipment.query.get_or_404(equipment_id)
-            sensors = equipment.sensors.filter_by(is_active=True).all()
+            equipment = metadata_registry.get_equipment_or_404(equipment_id)
+            sensors = equipment.active_sensors
             
             if not sensors:
                 return jsonify({'error': 'Equipamento sem sensores ativos'}), 400
@@ -290,16 +473,13 @@ def create_app(config_name='default'):
                 elif sensor.sensor_type == 'current':
                     value = random.uniform(3, 55)
                 elif sensor.sensor_type == 'runtime':
+                    # Horas de funcionamento desde a última manutenção (não cumulativo)
                     value = random.uniform(100, 2500)
                 else:
                     value = random.uniform(0, 100)
                 
                 # Detectar anomalia
-                is_anomaly = False
-                if sensor.max_threshold and value > sensor.max_threshold:
-                    is_anomaly = True
-                if sensor.min_threshold and value < sensor.min_threshold:
-                    is_anomaly = True
+                is_anomaly = sensor.is_anomaly(value)
                 
                 # Salvar leitura
                 reading = SensorReading(
@@ -320,8 +500,15 @@ def create_app(config_name='default'):
             
             db.session.commit()
             
-            # Analisar com sistema especialista
-            alerts_count = analyze_equipment_data(equipment_id, sensor_data)
+            # Analisar com sistema especialista (enfileirado no shard do equipamento)
+            if analysis_pool.enabled:
+                shard = analysis_pool.submit(equipment_id, sensor_data)
+                alerts_count = None
+            else:
+                # Import tardio: o motor de regras é pesado e só é usado aqui
+                from expert_system import analyze_equipment_data
+                shard = None
+                alerts_count = analyze_equipment_data(equipment_id, sensor_data)
             
             return jsonify({
                 'success': True,
@@ -329,18 +516,44 @@ def create_app(config_name='default'):
                 'equipment_name': equipment.name,
                 'readings': readings_created,
                 'alerts_generated': alerts_count,
+                'analysis_shard': shard,
                 'timestamp': datetime.utcnow().isoformat()
             })
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/analysis/metrics')
+    def analysis_metrics():
+        """Métricas do pool de workers de análise e do cache de regras"""
+        metrics = analysis_pool.metrics()
+        metrics['rule_cache'] = rule_cache.stats()
+        metrics['response_cache'] = response_cache.stats()
+        return jsonify(metrics)
+    
+    @app.route('/api/analysis/workers', methods=['POST'])
+    def resize_analysis_workers():
+        """Altera o número de workers de análise (0 = análise síncrona)"""
+        data = request.get_json() or {}
+        workers = data.get('workers')
+        if not isinstance(workers, int) or isinstance(workers, bool) or workers < 0:
+            return jsonify({'error': 'Informe workers (inteiro >= 0)'}), 400
+        
+        if not analysis_pool.resize(workers):
+            return jsonify({
+                'error': 'Rebalanceamento não concluído (filas não esvaziaram ou outro em andamento), tente novamente'
+            }), 503
+        return jsonify({'success': True, **analysis_pool.metrics()})
+    
     @app.route('/api/init-data', methods=['POST'])
     def init_sample_data():
         """Inicializar banco com dados de exemplo"""
         try:
             # Verificar se já existem dados
-            if Equipment.query.count() > 0:
+            existing = sum(
+                count for _, count in shard_router.gather(lambda: Equipment.query.count())
+            )
+            if existing > 0:
                 return jsonify({
                     'success': False,
                     'message': 'Banco de dados já contém dados'
@@ -371,7 +584,17 @@ def create_app(config_name='default'):
             equipments = []
             for eq_data in equipments_data:
                 eq = Equipment(**eq_data)
-                db.session.add(eq)
+                if shard_router.enabled:
+                    # Id global alocado no diretório do banco principal
+                    entry = EquipmentShard(
+                        shard=shard_router.shard_for_location(eq.location),
+                        location=eq.location
+                    )
+                    db.session.add(entry)
+                    db.session.flush()
+                    eq.id = entry.id
+                else:
+                    db.session.add(eq)
                 equipments.append(eq)
             
             db.session.flush()  # Para obter os IDs
@@ -409,11 +632,23 @@ def create_app(config_name='default'):
                  'min_threshold': 5, 'max_threshold': 80, 'mqtt_topic': 'sensor/heat_c3/curr'}
             ])
             
-            for sensor_data in sensors_data:
-                sensor = Sensor(**sensor_data)
-                db.session.add(sensor)
-            
-            db.session.commit()
+            if shard_router.enabled:
+                db.session.commit()
+                
+                # Equipamento e sensores gravados no shard da planta
+                for eq in equipments:
+                    with shard_router.use_shard(shard_router.shard_for_location(eq.location)):
+                        db.session.add(eq)
+                        for sensor_data in sensors_data:
+                            if sensor_data['equipment_id'] == eq.id:
+                                db.session.add(Sensor(**sensor_data))
+                        db.session.commit()
+            else:
+                for sensor_data in sensors_data:
+                    sensor = Sensor(**sensor_data)
+                    db.session.add(sensor)
+                
+                db.session.commit()
             
             return jsonify({
                 'success': True,
@@ -0,0 +1,78 @@
+"""
+Benchmark de inicialização do backend
+
+Sobe `python run.py` em um subprocesso, com as mesmas variáveis do
+ambiente (por padrão configuração development com reloader, como no
+docker-compose), e mede o tempo até a primeira resposta bem-sucedida de
+/api/health.
+
+Uso:
+    python bench_startup.py [--runs 5] [--database-url sqlite:////tmp/bench.db]
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def measure(database_url, port, timeout):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        PORT=str(port),
+        PYTHONUNBUFFERED='1'
+    )
+    url = f'http://127.0.0.1:{port}/api/health'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'run.py'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'run.py terminou com código {process.returncode}')
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f'Sem resposta de {url} em {timeout}s')
+    finally:
+        # Encerra o grupo inteiro: com o reloader o servidor é um processo filho
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument(
+        '--database-url',
+        default=os.getenv('DATABASE_URL', 'sqlite:////tmp/industrial_bench.db')
+    )
+    args = parser.parse_args()
+
+    times = []
+    for i in range(args.runs):
+        elapsed = measure(args.database_url, args.port, args.timeout)
+        times.append(elapsed)
+        print(f'Execução {i + 1}: {elapsed * 1000:.0f} ms até a primeira requisição')
+
+    print(f'Mediana: {statistics.median(times) * 1000:.0f} ms | '
+          f'mín: {min(times) * 1000:.0f} ms | máx: {max(times) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,26 @@
 import os
 from datetime import timedelta
+from sqlalchemy.engine import make_url
+
+def parse_mapping(value):
+    """Converte 'a=x;b=y' em {'a': 'x', 'b': 'y'}"""
+    mapping = {}
+    for item in (value or '').split(';'):
+        if '=' in item:
+            key, target = item.split('=', 1)
+            mapping[key.strip()] = target.strip()
+    return mapping
+
+def engine_options(url, pool_size):
+    """Opções de engine para a URL: pool_size só para bancos com pool de conexões"""
+    options = {'pool_pre_ping': True}
+    url = make_url(url)
+    in_memory = url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+    if not in_memory:
+        options['pool_size'] = pool_size
+    return options
 
 class Config:
     """Configurações da aplicação"""
@@ -14,6 +35,14 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    # Aplicado por URL em create_app (SQLite em memória não aceita pool_size)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    
+    # Shards por planta: DATABASE_SHARDS="planta1=sqlite:////tmp/p1.db;planta2=mysql+pymysql://..."
+    # PLANT_SHARDS="Linha de Produção 1=planta1;Setor de Estampagem=planta2"
+    # Plantas sem mapeamento são distribuídas por hash da localização.
+    DATABASE_SHARDS = parse_mapping(os.getenv('DATABASE_SHARDS'))
+    PLANT_SHARDS = parse_mapping(os.getenv('PLANT_SHARDS'))
     
     # JSON
     JSON_SORT_KEYS = False
@@ -33,6 +62,20 @@ class Config:
     DEFAULT_CURRENT_MIN = 5
     DEFAULT_CURRENT_MAX = 50
     DEFAULT_RUNTIME_MAINTENANCE = 2000
+    
+    # Registro de metadados em memória: recarga periódica (s) para alterações externas
+    METADATA_REGISTRY_TTL = int(os.getenv('METADATA_REGISTRY_TTL', 30))
+    
+    # Workers de análise (0 = análise síncrona na própria requisição)
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', os.cpu_count() or 1))
+    RULE_CACHE_SIZE = int(os.getenv('RULE_CACHE_SIZE', 4096))
+    
+    # Cache de respostas por equipamento (limite em bytes; TTL de segurança em segundos)
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+    
+    # Manutenção preditiva (intervalo do job em segundos)
+    MAINTENANCE_SCORING_INTERVAL = int(os.getenv('MAINTENANCE_SCORING_INTERVAL', 3600))
 
 class DevelopmentConfig(Config):
     """Configurações de desenvolvimento"""
@@ -1,7 +1,18 @@
 from pyknow import *
 from models import db, Alert, Equipment
+from alert_analytics import record_alert_created
+from sharding import shard_router
+from rule_cache import rule_cache
 from datetime import datetime
 
+def above(sensor_type, value):
+    """Predicado 'valor > limiar' registrado no cache de regras"""
+    return rule_cache.threshold(sensor_type, '>', value)
+
+def below(sensor_type, value):
+    """Predicado 'valor < limiar' registrado no cache de regras"""
+    return rule_cache.threshold(sensor_type, '<', value)
+
 class IndustrialFact(Fact):
     """Fato para o sistema especialista"""
     pass
@@ -13,11 +24,12 @@ class IndustrialExpertSystem(KnowledgeEngine):
         super().__init__()
         self.equipment_id = equipment_id
         self.alerts_to_create = []
+        self.status_updates = []
     
     # Regra 1: Temperatura Crítica + Vibração Alta
     @Rule(
-        IndustrialFact(temperature=P(lambda x: x > 85)),
-        IndustrialFact(vibration=P(lambda x: x > 3))
+        IndustrialFact(temperature=P(above('temperature', 85))),
+        IndustrialFact(vibration=P(above('vibration', 3)))
     )
     def critical_bearing_failure(self):
         """Falha crítica de rolamento detectada"""
@@ -31,7 +43,7 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 2: Temperatura Elevada
     @Rule(
-        IndustrialFact(temperature=P(lambda x: 70 < x <= 85))
+        IndustrialFact(temperature=P(above('temperature', 70)) & ~P(above('temperature', 85)))
     )
     def high_temperature_warning(self):
         """Temperatura elevada"""
@@ -45,7 +57,7 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 3: Vibração Excessiva
     @Rule(
-        IndustrialFact(vibration=P(lambda x: x > 2.5))
+        IndustrialFact(vibration=P(above('vibration', 2.5)))
     )
     def excessive_vibration_warning(self):
         """Vibração excessiva"""
@@ -59,7 +71,7 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 4: Corrente Elétrica Anormal
     @Rule(
-        IndustrialFact(current=P(lambda x: x > 50 or x < 5))
+        IndustrialFact(current=P(above('current', 50)) | P(below('current', 5)))
     )
     def abnormal_current_warning(self):
         """Corrente elétrica anormal"""
@@ -72,7 +84,7 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 5: Tempo de Funcionamento Alto (necessita manutenção preventiva)
     @Rule(
-        IndustrialFact(runtime=P(lambda x: x > 2000))
+        IndustrialFact(runtime=P(above('runtime', 2000)))
     )
     def preventive_maintenance_needed(self):
         """Manutenção preventiva necessária"""
@@ -85,9 +97,9 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 6: Múltiplos Sensores Anormais (Falha Sistêmica)
     @Rule(
-        IndustrialFact(temperature=P(lambda x: x > 75)),
-        IndustrialFact(vibration=P(lambda x: x > 2)),
-        IndustrialFact(current=P(lambda x: x > 45))
+        IndustrialFact(temperature=P(above('temperature', 75))),
+        IndustrialFact(vibration=P(above('vibration', 2))),
+        IndustrialFact(current=P(above('current', 45)))
     )
     def systemic_failure_critical(self):
         """Falha sistêmica detectada"""
@@ -101,8 +113,8 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 7: Vibração Baixa + Corrente Alta (Problema de Carga)
     @Rule(
-        IndustrialFact(vibration=P(lambda x: x < 0.5)),
-        IndustrialFact(current=P(lambda x: x > 40))
+        IndustrialFact(vibration=P(below('vibration', 0.5))),
+        IndustrialFact(current=P(above('current', 40)))
     )
     def load_problem_warning(self):
         """Problema de carga"""
@@ -115,8 +127,8 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     # Regra 8: Descalibração (valores muito constantes)
     @Rule(
-        IndustrialFact(temperature_variance=P(lambda x: x < 0.1)),
-        IndustrialFact(vibration_variance=P(lambda x: x < 0.05))
+        IndustrialFact(temperature_variance=P(below('temperature_variance', 0.1))),
+        IndustrialFact(vibration_variance=P(below('vibration_variance', 0.05)))
     )
     def sensor_calibration_warning(self):
         """Possível descalibração de sensores"""
@@ -129,33 +141,54 @@ class IndustrialExpertSystem(KnowledgeEngine):
     
     def _update_equipment_status(self, status):
         """Atualiza status do equipamento"""
-        equipment = Equipment.query.get(self.equipment_id)
-        if equipment:
-            # Só atualiza se o novo status for mais crítico
-            priority = {'operational': 0, 'warning': 1, 'critical': 2}
-            current_priority = priority.get(equipment.status, 0)
-            new_priority = priority.get(status, 0)
-            
-            if new_priority > current_priority:
-                equipment.status = status
-                db.session.commit()
+        self.status_updates.append(status)
+        _apply_status(self.equipment_id, status)
     
     def create_alerts(self):
         """Cria alertas no banco de dados"""
-        for alert_data in self.alerts_to_create:
-            alert = Alert(
-                equipment_id=self.equipment_id,
-                severity=alert_data['severity'],
-                title=alert_data['title'],
-                description=alert_data['description'],
-                rule_triggered=alert_data['rule_triggered']
-            )
-            db.session.add(alert)
+        return _save_alerts(self.equipment_id, self.alerts_to_create)
+
+
+# Nomes das regras (entram na versão do cache de regras)
+RULE_NAMES = [
+    name for name, value in vars(IndustrialExpertSystem).items()
+    if isinstance(value, Rule)
+]
+rule_cache.bind_rules(RULE_NAMES)
+
+
+def _apply_status(equipment_id, status):
+    """Atualiza status do equipamento se o novo status for mais crítico"""
+    equipment = Equipment.query.get(equipment_id)
+    if equipment:
+        priority = {'operational': 0, 'warning': 1, 'critical': 2}
+        current_priority = priority.get(equipment.status, 0)
+        new_priority = priority.get(status, 0)
         
-        if self.alerts_to_create:
+        if new_priority > current_priority:
+            equipment.status = status
             db.session.commit()
-        
-        return len(self.alerts_to_create)
+
+
+def _save_alerts(equipment_id, alerts_to_create):
+    """Cria alertas no banco de dados e atualiza os contadores de analytics"""
+    now = datetime.utcnow()
+    for alert_data in alerts_to_create:
+        alert = Alert(
+            equipment_id=equipment_id,
+            severity=alert_data['severity'],
+            title=alert_data['title'],
+            description=alert_data['description'],
+            rule_triggered=alert_data['rule_triggered'],
+            created_at=now
+        )
+        db.session.add(alert)
+        record_alert_created(alert)
+    
+    if alerts_to_create:
+        db.session.commit()
+    
+    return len(alerts_to_create)
 
 
 def analyze_equipment_data(equipment_id, sensor_data):
@@ -169,17 +202,30 @@ def analyze_equipment_data(equipment_id, sensor_data):
     Returns:
         número de alertas criados
     """
-    engine = IndustrialExpertSystem(equipment_id)
-    engine.reset()
-    
-    # Declara os fatos
-    for sensor_type, value in sensor_data.items():
-        engine.declare(IndustrialFact(**{sensor_type: value}))
-    
-    # Executa o motor de inferência
-    engine.run()
-    
-    # Cria os alertas
-    alerts_count = engine.create_alerts()
+    # Snapshots na mesma faixa de limiares disparam as mesmas regras
+    signature = rule_cache.signature(sensor_data)
+    outcome = rule_cache.get(signature)
+    
+    with shard_router.use_shard(shard_router.shard_for_equipment(equipment_id)):
+        if outcome is None:
+            engine = IndustrialExpertSystem(equipment_id)
+            engine.reset()
+            
+            # Declara os fatos
+            for sensor_type, value in sensor_data.items():
+                engine.declare(IndustrialFact(**{sensor_type: value}))
+            
+            # Executa o motor de inferência
+            engine.run()
+            
+            outcome = (tuple(engine.alerts_to_create), tuple(engine.status_updates))
+            rule_cache.put(signature, outcome)
+        else:
+            # Reaplica as mudanças de status sem rodar o motor de inferência
+            for status in outcome[1]:
+                _apply_status(equipment_id, status)
+        
+        # Cria os alertas no shard dono do equipamento
+        alerts_count = _save_alerts(equipment_id, outcome[0])
     
     return alerts_count
\ No newline at end of file
@@ -1,7 +1,8 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sharding import ShardSession, session_scope
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ShardSession, 'scopefunc': session_scope})
 
 class Equipment(db.Model):
     """Modelo de Equipamento Industrial"""
@@ -118,4 +119,59 @@ class KnowledgeRule(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Rule {self.name}>'
\ No newline at end of file
+        return f'<Rule {self.name}>'
+
+
+class AlertStat(db.Model):
+    """Contadores pré-agregados de alertas por hora, severidade, regra e equipamento"""
+    __tablename__ = 'alert_stats'
+    __table_args__ = (
+        db.UniqueConstraint('bucket', 'equipment_id', 'severity', 'rule_triggered',
+                            name='uq_alert_stats_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.DateTime, nullable=False, index=True)  # início da hora
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipments.id'), nullable=False)
+    severity = db.Column(db.String(20), nullable=False)
+    rule_triggered = db.Column(db.String(200), nullable=False, default='')
+    alerts_count = db.Column(db.Integer, nullable=False, default=0)
+    acknowledged_count = db.Column(db.Integer, nullable=False, default=0)
+    ack_seconds_total = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AlertStat {self.bucket} {self.severity} {self.rule_triggered}>'
+
+
+class MaintenancePrediction(db.Model):
+    """Previsão de manutenção pré-calculada por equipamento"""
+    __tablename__ = 'maintenance_predictions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    equipment_id = db.Column(db.Integer, db.ForeignKey('equipments.id'), nullable=False, unique=True)
+    runtime_since_maintenance = db.Column(db.Float)  # horas
+    maintenance_interval = db.Column(db.Float)  # horas, ajustado pelo histórico
+    remaining_useful_life = db.Column(db.Float, index=True)  # horas
+    next_maintenance_due = db.Column(db.DateTime)
+    risk_score = db.Column(db.Float, index=True)  # 0 (novo) a 1 (manutenção vencida)
+    temperature_trend = db.Column(db.Float)  # °C/dia
+    vibration_trend = db.Column(db.Float)  # mm/s/dia
+    corrective_count = db.Column(db.Integer, default=0)  # corretivas nos últimos 365 dias
+    last_maintenance_date = db.Column(db.DateTime)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MaintenancePrediction Equipment {self.equipment_id} - RUL {self.remaining_useful_life}>'
+
+
+class EquipmentShard(db.Model):
+    """Diretório global de equipamentos (banco principal): id global -> shard"""
+    __tablename__ = 'equipment_shards'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    shard = db.Column(db.String(50), nullable=False, index=True)
+    location = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<EquipmentShard {self.id} -> {self.shard}>'
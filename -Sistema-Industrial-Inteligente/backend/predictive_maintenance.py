@@ -0,0 +1,244 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, MaintenanceRecord, MaintenancePrediction, Sensor, SensorReading
+from registry import metadata_registry
+from sharding import shard_router
+
+# Janelas de tendência: média recente (últimas 24h) vs. média anterior (1 a 7 dias)
+RECENT_WINDOW = timedelta(hours=24)
+TREND_WINDOW = timedelta(days=7)
+TREND_SPAN_DAYS = 3.5  # distância entre os pontos médios das duas janelas
+
+# Horímetro sem manutenção registrada: considera só leituras recentes
+RUNTIME_LOOKBACK = timedelta(days=30)
+
+# Histórico do último ano: cada corretiva reduz o intervalo em 10% (até 50%);
+# cada preventiva/preditiva concluída compensa meia corretiva
+CORRECTIVE_PENALTY = 0.1
+PLANNED_CREDIT = 0.5
+MIN_INTERVAL_FACTOR = 0.5
+
+
+def _last_completed_maintenance():
+    rows = db.session.query(
+        MaintenanceRecord.equipment_id,
+        db.func.max(MaintenanceRecord.completed_date)
+    ).filter(
+        MaintenanceRecord.status == 'completed',
+        MaintenanceRecord.completed_date.isnot(None)
+    ).group_by(MaintenanceRecord.equipment_id).all()
+    return dict(rows)
+
+
+def _maintenance_history(since):
+    """Manutenções concluídas desde since, por equipamento e tipo"""
+    rows = db.session.query(
+        MaintenanceRecord.equipment_id,
+        MaintenanceRecord.maintenance_type,
+        db.func.count(MaintenanceRecord.id)
+    ).filter(
+        MaintenanceRecord.status == 'completed',
+        MaintenanceRecord.completed_date >= since
+    ).group_by(MaintenanceRecord.equipment_id, MaintenanceRecord.maintenance_type).all()
+
+    history = {}
+    for equipment_id, maintenance_type, count in rows:
+        history.setdefault(equipment_id, {})[maintenance_type] = count
+    return history
+
+
+def _runtime_readings(now):
+    """
+    Última leitura do horímetro feita após a última manutenção concluída
+
+    O sensor runtime mede horas de funcionamento desde a última manutenção
+    (ver Regra 5 do sistema especialista), então vale a leitura mais recente,
+    não a maior. Só são lidas as leituras posteriores à última manutenção
+    (ou de RUNTIME_LOOKBACK, se não houver manutenção registrada).
+    """
+    last_maintenance = db.session.query(
+        MaintenanceRecord.equipment_id.label('equipment_id'),
+        db.func.max(MaintenanceRecord.completed_date).label('completed_date')
+    ).filter(
+        MaintenanceRecord.status == 'completed'
+    ).group_by(MaintenanceRecord.equipment_id).subquery()
+
+    latest = db.session.query(
+        SensorReading.equipment_id.label('equipment_id'),
+        db.func.max(SensorReading.timestamp).label('timestamp')
+    ).join(Sensor, Sensor.id == SensorReading.sensor_id).outerjoin(
+        last_maintenance,
+        last_maintenance.c.equipment_id == SensorReading.equipment_id
+    ).filter(
+        Sensor.sensor_type == 'runtime',
+        SensorReading.timestamp >= db.func.coalesce(
+            last_maintenance.c.completed_date,
+            now - RUNTIME_LOOKBACK
+        )
+    ).group_by(SensorReading.equipment_id).subquery()
+
+    rows = db.session.query(
+        SensorReading.equipment_id,
+        SensorReading.value
+    ).join(Sensor, Sensor.id == SensorReading.sensor_id).join(
+        latest,
+        db.and_(
+            latest.c.equipment_id == SensorReading.equipment_id,
+            latest.c.timestamp == SensorReading.timestamp
+        )
+    ).filter(Sensor.sensor_type == 'runtime').all()
+    return dict(rows)
+
+
+def _degradation_trends(now):
+    """Média recente e tendência diária de temperatura/vibração por equipamento"""
+    recent_start = now - RECENT_WINDOW
+    recent_value = db.case((SensorReading.timestamp >= recent_start, SensorReading.value))
+    older_value = db.case((SensorReading.timestamp < recent_start, SensorReading.value))
+
+    rows = db.session.query(
+        SensorReading.equipment_id,
+        Sensor.sensor_type,
+        db.func.avg(recent_value),
+        db.func.avg(older_value)
+    ).join(Sensor, Sensor.id == SensorReading.sensor_id).filter(
+        Sensor.sensor_type.in_(('temperature', 'vibration')),
+        SensorReading.timestamp >= now - TREND_WINDOW
+    ).group_by(SensorReading.equipment_id, Sensor.sensor_type).all()
+
+    trends = {}
+    for equipment_id, sensor_type, recent, older in rows:
+        if recent is None:
+            continue
+        slope = (float(recent) - float(older)) / TREND_SPAN_DAYS if older is not None else 0.0
+        trends[(equipment_id, sensor_type)] = (float(recent), slope)
+    return trends
+
+
+def _hours_to_threshold(trend, threshold):
+    """Horas até a média atingir o limite de alerta mantida a tendência atual"""
+    if trend is None:
+        return None
+    level, slope_per_day = trend
+    if level >= threshold:
+        return 0.0
+    if slope_per_day <= 0:
+        return None
+    return (threshold - level) / slope_per_day * 24
+
+
+def compute_predictions(equipments, now=None):
+    """
+    Calcula vida útil remanescente e próxima manutenção dos equipamentos
+
+    Cada fonte de dados é obtida em uma única consulta agregada (GROUP BY),
+    independente do número de equipamentos. Com shards, as consultas vão ao
+    shard ativo: equipments deve conter apenas os equipamentos dele.
+
+    Args:
+        equipments: EquipmentRecords do registro de metadados
+        now: instante de referência (padrão: agora)
+
+    Returns:
+        lista de dicts prontos para inserção em maintenance_predictions
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    base_interval = float(config['DEFAULT_RUNTIME_MAINTENANCE'])
+
+    last_maintenance = _last_completed_maintenance()
+    history = _maintenance_history(now - timedelta(days=365))
+    runtime_readings = _runtime_readings(now)
+    trends = _degradation_trends(now)
+
+    predictions = []
+    for equipment in equipments:
+        eq_id = equipment.id
+        last_date = last_maintenance.get(eq_id)
+        counts = history.get(eq_id, {})
+        corrective_count = counts.get('corrective', 0)
+        planned_count = counts.get('preventive', 0) + counts.get('predictive', 0)
+
+        # Horas de funcionamento desde a última manutenção
+        if eq_id in runtime_readings:
+            runtime_since = float(runtime_readings[eq_id])
+        elif last_date:
+            runtime_since = (now - last_date).total_seconds() / 3600
+        else:
+            runtime_since = 0.0
+        runtime_since = max(runtime_since, 0.0)
+
+        failures = max(corrective_count - PLANNED_CREDIT * planned_count, 0)
+        interval = base_interval * max(MIN_INTERVAL_FACTOR, 1 - CORRECTIVE_PENALTY * failures)
+
+        temperature = trends.get((eq_id, 'temperature'))
+        vibration = trends.get((eq_id, 'vibration'))
+        candidates = [interval - runtime_since]
+        for hours in (
+            _hours_to_threshold(temperature, config['DEFAULT_TEMP_WARNING']),
+            _hours_to_threshold(vibration, config['DEFAULT_VIBRATION_WARNING'])
+        ):
+            if hours is not None:
+                candidates.append(hours)
+        remaining = max(min(candidates), 0.0)
+
+        predictions.append({
+            'equipment_id': eq_id,
+            'runtime_since_maintenance': runtime_since,
+            'maintenance_interval': interval,
+            'remaining_useful_life': remaining,
+            'next_maintenance_due': now + timedelta(hours=remaining),
+            'risk_score': min(max(1 - remaining / interval, 0.0), 1.0),
+            'temperature_trend': temperature[1] if temperature else None,
+            'vibration_trend': vibration[1] if vibration else None,
+            'corrective_count': corrective_count,
+            'last_maintenance_date': last_date,
+            'computed_at': now
+        })
+    return predictions
+
+
+def refresh_predictions():
+    """Recalcula as previsões de todos os shards em paralelo"""
+    # Resolve a frota antes do scatter: tarefas do gather não podem recarregar
+    # o registro (que também usa o executor dos shards)
+    equipments_by_shard = {}
+    for equipment in metadata_registry.all_equipments():
+        equipments_by_shard.setdefault(equipment.shard, []).append(equipment)
+    return sum(count for _, count in shard_router.gather(_refresh_shard, equipments_by_shard))
+
+
+def _refresh_shard(equipments_by_shard):
+    """Substitui a tabela de previsões do shard em uma transação"""
+    predictions = compute_predictions(equipments_by_shard.get(shard_router.current, []))
+    MaintenancePrediction.query.delete()
+    if predictions:
+        db.session.execute(MaintenancePrediction.__table__.insert(), predictions)
+    db.session.commit()
+    return len(predictions)
+
+
+def start_scheduler(app, interval=None):
+    """Executa refresh_predictions periodicamente em uma thread em segundo plano"""
+    interval = interval or app.config['MAINTENANCE_SCORING_INTERVAL']
+
+    def _loop():
+        while True:
+            with app.app_context():
+                try:
+                    started = time.perf_counter()
+                    count = refresh_predictions()
+                    print(f"🛠️ Previsões de manutenção atualizadas: {count} equipamentos "
+                          f"em {time.perf_counter() - started:.2f}s")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Falha ao calcular previsões de manutenção: {e}")
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name='maintenance-scoring', daemon=True)
+    thread.start()
+    return thread
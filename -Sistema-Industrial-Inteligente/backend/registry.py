@@ -0,0 +1,269 @@
+import threading
+import time
+from datetime import datetime
+from flask import abort
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import Equipment, Sensor
+from sharding import shard_router
+
+# Intervalo mínimo (s) entre recargas disparadas por ids desconhecidos
+MISS_RELOAD_INTERVAL = 1.0
+
+# Colunas voláteis de Equipment: atualizadas no registro sem recarga
+VOLATILE_COLUMNS = frozenset(('status', 'updated_at'))
+
+
+class SensorRecord:
+    """Metadados imutáveis de um sensor mantidos em memória"""
+    __slots__ = ('id', 'equipment_id', 'sensor_type', 'unit', 'min_threshold',
+                 'max_threshold', 'is_active', 'mqtt_topic')
+
+    def __init__(self, sensor):
+        self.id = sensor.id
+        self.equipment_id = sensor.equipment_id
+        self.sensor_type = sensor.sensor_type
+        self.unit = sensor.unit
+        # Thresholds zerados/nulos são ignorados, como na checagem original
+        self.min_threshold = float(sensor.min_threshold) if sensor.min_threshold else None
+        self.max_threshold = float(sensor.max_threshold) if sensor.max_threshold else None
+        self.is_active = bool(sensor.is_active)
+        self.mqtt_topic = sensor.mqtt_topic
+
+    def is_anomaly(self, value):
+        """Verifica se o valor está fora dos limites do sensor"""
+        if self.max_threshold is not None and value > self.max_threshold:
+            return True
+        if self.min_threshold is not None and value < self.min_threshold:
+            return True
+        return False
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.sensor_type,
+            'unit': self.unit,
+            'min_threshold': self.min_threshold,
+            'max_threshold': self.max_threshold,
+            'is_active': self.is_active,
+            'mqtt_topic': self.mqtt_topic
+        }
+
+
+class EquipmentRecord:
+    """Metadados de um equipamento e seus sensores mantidos em memória"""
+    __slots__ = ('id', 'name', 'type', 'location', 'status', 'created_at',
+                 'updated_at', 'sensors', 'active_sensors', 'shard')
+
+    def __init__(self, equipment, sensors, shard=None):
+        self.id = equipment.id
+        self.name = equipment.name
+        self.type = equipment.type
+        self.location = equipment.location
+        self.status = equipment.status
+        self.created_at = equipment.created_at
+        self.updated_at = equipment.updated_at
+        self.sensors = tuple(sensors)
+        self.active_sensors = tuple(s for s in self.sensors if s.is_active)
+        self.shard = shard
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'location': self.location,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class MetadataRegistry:
+    """
+    Registro em memória de equipamentos, sensores e tópicos MQTT
+
+    Os metadados são carregados em duas consultas por shard e recarregados
+    quando o carimbo de versão muda (qualquer commit deste processo que
+    insira, altere ou remova Equipment/Sensor) ou após ttl segundos, o que
+    cobre alterações feitas por outros processos ou direto no banco. Um id
+    desconhecido também força uma recarga antes de ser tratado como ausente.
+
+    Mudanças só de status (sistema especialista) são aplicadas no próprio
+    EquipmentRecord, sem invalidar. Recargas são únicas: quem chega durante
+    uma carga espera por ela em vez de disparar outra.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = -1
+        self._expires_at = 0.0
+        self._last_miss_reload = 0.0
+        self._loading = None
+        self._status_patches = {}
+        self._state = ({}, {})
+        self._listening = False
+
+    def init_app(self, app):
+        """Registra os listeners de invalidação na sessão do SQLAlchemy"""
+        app.extensions['metadata_registry'] = self
+        self.ttl = app.config.get('METADATA_REGISTRY_TTL', self.ttl)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._on_after_flush)
+            event.listen(Session, 'after_commit', self._on_after_commit)
+            event.listen(Session, 'after_rollback', self._on_after_rollback)
+            self._listening = True
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self):
+        """Marca os metadados como desatualizados"""
+        with self._lock:
+            self._version += 1
+
+    def patch_status(self, equipment_id, status, updated_at):
+        """Atualiza o status de um equipamento no registro sem recarregar"""
+        with self._lock:
+            self._status_patches[equipment_id] = (status, updated_at, time.monotonic())
+            equipment = self._state[0].get(equipment_id)
+            if equipment is not None:
+                equipment.status = status
+                equipment.updated_at = updated_at
+
+    def get_equipment(self, equipment_id):
+        """Retorna o EquipmentRecord ou None"""
+        equipment = self._snapshot()[0].get(equipment_id)
+        if equipment is None and self._reload_on_miss():
+            equipment = self._snapshot()[0].get(equipment_id)
+        return equipment
+
+    def get_equipment_or_404(self, equipment_id):
+        equipment = self.get_equipment(equipment_id)
+        if equipment is None:
+            abort(404)
+        return equipment
+
+    def all_equipments(self):
+        return list(self._snapshot()[0].values())
+
+    def sensor_for_topic(self, topic):
+        """Resolve um tópico MQTT para o SensorRecord correspondente"""
+        sensor = self._snapshot()[1].get(topic)
+        if sensor is None and self._reload_on_miss():
+            sensor = self._snapshot()[1].get(topic)
+        return sensor
+
+    # ==================== INTERNOS ====================
+
+    def _snapshot(self):
+        if self._loaded_version != self._version:
+            # Invalidado: espera pela carga com os dados novos
+            self._refresh(wait=True)
+        elif time.monotonic() >= self._expires_at:
+            # Só expirado: se outra thread já recarrega, usa o estado atual
+            self._refresh(wait=False)
+        return self._state
+
+    def _refresh(self, wait):
+        """Recarga única: uma thread carrega, as demais esperam por ela"""
+        target = self._version
+        while True:
+            with self._lock:
+                if self._loaded_version >= target and time.monotonic() < self._expires_at:
+                    return
+                loading = self._loading
+                owner = loading is None
+                if owner:
+                    loading = self._loading = threading.Event()
+            if owner:
+                try:
+                    self._load()
+                finally:
+                    with self._lock:
+                        self._loading = None
+                    loading.set()
+                return
+            if not wait:
+                return
+            loading.wait()
+
+    def _reload_on_miss(self):
+        """Invalida para buscar ids criados fora deste processo (no máximo 1x/s)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_miss_reload < MISS_RELOAD_INTERVAL:
+                return False
+            self._last_miss_reload = now
+            self._version += 1
+        return True
+
+    def _load(self):
+        # Carrega fora do lock: o gather espera por threads do executor dos
+        # shards, e segurar o lock ali bloquearia todo acesso ao registro
+        version = self._version
+        started = time.monotonic()
+        equipments = {}
+        sensors_by_topic = {}
+        for shard, records in shard_router.gather(self._load_shard):
+            for record in records:
+                record.shard = shard
+                equipments[record.id] = record
+                for sensor in record.sensors:
+                    if sensor.mqtt_topic:
+                        sensors_by_topic[sensor.mqtt_topic] = sensor
+
+        # Troca atômica: leitores sempre veem um par consistente
+        with self._lock:
+            # Status alterados durante a carga podem não estar nas linhas lidas
+            for equipment_id, (status, updated_at, stamp) in list(self._status_patches.items()):
+                if stamp < started:
+                    del self._status_patches[equipment_id]
+                elif equipment_id in equipments:
+                    equipments[equipment_id].status = status
+                    equipments[equipment_id].updated_at = updated_at
+            self._state = (equipments, sensors_by_topic)
+            self._loaded_version = version
+            self._expires_at = started + self.ttl
+
+    @staticmethod
+    def _load_shard():
+        sensors_by_equipment = {}
+        for sensor in Sensor.query.order_by(Sensor.id).all():
+            record = SensorRecord(sensor)
+            sensors_by_equipment.setdefault(record.equipment_id, []).append(record)
+        return [
+            EquipmentRecord(eq, sensors_by_equipment.get(eq.id, ()))
+            for eq in Equipment.query.order_by(Equipment.id).all()
+        ]
+
+    def _on_after_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if not isinstance(obj, (Equipment, Sensor)):
+                continue
+            if isinstance(obj, Equipment) and obj in session.dirty:
+                state = inspect(obj)
+                changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+                if changed <= VOLATILE_COLUMNS:
+                    session.info.setdefault('metadata_status', {})[obj.id] = (
+                        obj.status, state.dict.get('updated_at') or datetime.utcnow()
+                    )
+                    continue
+            session.info['metadata_changed'] = True
+
+    def _on_after_commit(self, session):
+        statuses = session.info.pop('metadata_status', {})
+        if session.info.pop('metadata_changed', False):
+            self.invalidate()
+        for equipment_id, (status, updated_at) in statuses.items():
+            self.patch_status(equipment_id, status, updated_at)
+
+    def _on_after_rollback(self, session):
+        session.info.pop('metadata_changed', None)
+        session.info.pop('metadata_status', None)
+
+
+metadata_registry = MetadataRegistry()
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Equipment, Sensor, SensorReading, Alert, MaintenanceRecord
+
+
+class _InFlight:
+    """Construção em andamento compartilhada por requisições idênticas"""
+    __slots__ = ('done', 'body', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Cache LRU de respostas por equipamento, limitado em bytes
+
+    As entradas de um equipamento são descartadas no commit de qualquer
+    escrita em leituras, alertas, manutenções, sensores ou status dele.
+    Requisições idênticas simultâneas esperam uma única construção.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # chave -> (body, expira_em)
+        self._keys_by_equipment = {}
+        self._generation = {}
+        self._in_flight = {}
+        self._size = 0
+        self._listening = False
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        app.extensions['response_cache'] = self
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', self.ttl)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._on_after_flush)
+            event.listen(Session, 'after_commit', self._on_after_commit)
+            event.listen(Session, 'after_rollback', self._on_after_rollback)
+            self._listening = True
+
+    def get_or_build(self, equipment_id, params, build):
+        """
+        Retorna o corpo em cache ou constrói com build() (uma vez por chave)
+
+        Args:
+            equipment_id: ID do equipamento dono da resposta
+            params: parâmetros da requisição que alteram a resposta
+            build: função sem argumentos que devolve o corpo (bytes)
+        """
+        key = (equipment_id, tuple(sorted(params.items(multi=True))))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = self._in_flight[key] = _InFlight()
+                generation = self._generation.get(equipment_id, 0)
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.body
+
+        try:
+            in_flight.body = build()
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                # Só guarda se nenhuma escrita invalidou o equipamento durante a construção
+                if in_flight.error is None and self._generation.get(equipment_id, 0) == generation:
+                    self._store(key, equipment_id, in_flight.body)
+            in_flight.done.set()
+        return in_flight.body
+
+    def invalidate(self, equipment_id):
+        """Descarta todas as respostas de um equipamento"""
+        with self._lock:
+            self._generation[equipment_id] = self._generation.get(equipment_id, 0) + 1
+            for key in self._keys_by_equipment.pop(equipment_id, ()):
+                body, _ = self._entries.pop(key)
+                self._size -= len(body)
+            self.invalidations += 1
+
+    def on_analysis_result(self, result):
+        """Callback do pool de análise: alertas/status gravados por outro processo"""
+        if result['alerts_generated'] != 0 or result['metadata_changed'] or result['status']:
+            self.invalidate(result['equipment_id'])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    # ==================== INTERNOS ====================
+
+    def _store(self, key, equipment_id, body):
+        if len(body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old[0])
+        self._entries[key] = (body, time.monotonic() + self.ttl)
+        self._keys_by_equipment.setdefault(equipment_id, set()).add(key)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            old_key, (old_body, _) = self._entries.popitem(last=False)
+            self._size -= len(old_body)
+            keys = self._keys_by_equipment.get(old_key[0])
+            if keys is not None:
+                keys.discard(old_key)
+                if not keys:
+                    del self._keys_by_equipment[old_key[0]]
+            self.evictions += 1
+
+    def _on_after_flush(self, session, flush_context):
+        touched = session.info.setdefault('response_cache_equipments', set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, Equipment):
+                touched.add(obj.id)
+            elif isinstance(obj, (SensorReading, Alert, MaintenanceRecord, Sensor)):
+                touched.add(obj.equipment_id)
+
+    def _on_after_commit(self, session):
+        for equipment_id in session.info.pop('response_cache_equipments', ()):
+            self.invalidate(equipment_id)
+
+    def _on_after_rollback(self, session):
+        session.info.pop('response_cache_equipments', None)
+
+
+response_cache = ResponseCache()
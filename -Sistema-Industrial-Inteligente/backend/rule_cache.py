@@ -0,0 +1,130 @@
+import hashlib
+import operator
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import KnowledgeRule
+
+OPERATORS = {'>': operator.gt, '<': operator.lt}
+
+
+class RuleCache:
+    """
+    Memoização do motor de inferência por faixa de limiares
+
+    Cada limiar usado pelas regras é registrado aqui (via threshold()). Um
+    snapshot de sensores é reduzido à assinatura "quais limiares cada valor
+    ultrapassa"; snapshots com a mesma assinatura disparam exatamente as
+    mesmas regras, então o resultado da inferência é reaproveitado de um LRU.
+
+    O cache é descartado quando o conjunto de limiares/regras muda ou quando
+    um commit altera KnowledgeRule.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._thresholds = {}
+        self._predicates = {}
+        self._rules_version = None
+        self._listening = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        app.extensions['rule_cache'] = self
+        self.maxsize = app.config.get('RULE_CACHE_SIZE', self.maxsize)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._on_after_flush)
+            event.listen(Session, 'after_commit', self._on_after_commit)
+            event.listen(Session, 'after_rollback', self._on_after_rollback)
+            self._listening = True
+
+    def threshold(self, sensor_type, op, value):
+        """Registra um limiar e devolve o predicado usado pela regra"""
+        compare = OPERATORS[op]
+        predicate = lambda x: compare(x, value)
+        thresholds = self._thresholds.setdefault(sensor_type, {})
+        predicate = thresholds.setdefault((op, value), predicate)
+        self._predicates[sensor_type] = tuple(
+            thresholds[key] for key in sorted(thresholds)
+        )
+        return predicate
+
+    def bind_rules(self, rule_names):
+        """Versão das regras: muda se limiares ou nomes de regras mudarem"""
+        digest = hashlib.sha1()
+        for sensor_type in sorted(self._thresholds):
+            digest.update(f'{sensor_type}:{sorted(self._thresholds[sensor_type])}'.encode())
+        digest.update(','.join(sorted(rule_names)).encode())
+        version = digest.hexdigest()
+        if version != self._rules_version:
+            self._rules_version = version
+            self.invalidate()
+
+    def signature(self, sensor_data):
+        """Assinatura de intervalo do snapshot (sensores sem limiar são ignorados)"""
+        return tuple(
+            (sensor_type, tuple(predicate(value) for predicate in self._predicates[sensor_type]))
+            for sensor_type, value in sorted(sensor_data.items())
+            if sensor_type in self._predicates
+        )
+
+    def get(self, signature):
+        with self._lock:
+            outcome = self._entries.get(signature)
+            if outcome is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return outcome
+
+    def put(self, signature, outcome):
+        with self._lock:
+            self._entries[signature] = outcome
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'rules_version': self._rules_version
+            }
+
+    # ==================== INTERNOS ====================
+
+    def _on_after_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, KnowledgeRule):
+                session.info['rules_changed'] = True
+                return
+
+    def _on_after_commit(self, session):
+        if session.info.pop('rules_changed', False):
+            self.invalidate()
+
+    def _on_after_rollback(self, session):
+        session.info.pop('rules_changed', None)
+
+
+rule_cache = RuleCache()
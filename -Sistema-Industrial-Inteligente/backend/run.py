@@ -1,36 +1,49 @@
+import os
 import time
+
+_started = time.perf_counter()
+
 from app import create_app
-from models import db
+from startup import wait_for_db, warm_connection_pool, ensure_schema, prewarm_caches
+from predictive_maintenance import start_scheduler
 
-def wait_for_db(app, max_retries=30):
-    """Aguarda o banco de dados estar pronto"""
-    print("🔄 Aguardando banco de dados MySQL...")
-    for i in range(max_retries):
-        try:
-            with app.app_context():
-                db.engine.connect()
-            print("✅ Banco de dados conectado!")
-            return True
-        except Exception as e:
-            print(f"⏳ Tentativa {i+1}/{max_retries}: {str(e)[:50]}")
-            time.sleep(2)
-    return False
+def prepare(app):
+    """Banco, schema, pool e caches do processo que atende requisições"""
+    # Aguardar banco de dados (backoff exponencial)
+    if not wait_for_db(app):
+        return False
+    
+    # Verificar versão do schema (create_all só quando necessário)
+    if ensure_schema(app):
+        print("🔨 Tabelas criadas/atualizadas no banco de dados!")
+    else:
+        print("✅ Schema já está atualizado")
+    
+    print(f"🔌 {warm_connection_pool(app)} conexões abertas no pool")
+    prewarm_caches(app)
+    start_scheduler(app)
+    return True
 
 if __name__ == '__main__':
-    app = create_app('development')
+    app = create_app(os.getenv('FLASK_CONFIG', 'development'))
+    
+    # Com o reloader, o processo pai só vigia arquivos e reinicia o filho
+    # (WERKZEUG_RUN_MAIN): banco, pool e caches são preparados apenas no filho
+    use_reloader = app.debug and os.getenv('FLASK_RELOADER', '1') == '1'
+    serving = not use_reloader or os.getenv('WERKZEUG_RUN_MAIN') == 'true'
     
-    # Aguardar banco de dados
-    if wait_for_db(app):
-        # Criar tabelas
-        with app.app_context():
-            print("🔨 Criando tabelas no banco de dados...")
-            db.create_all()
-            print("✅ Tabelas criadas!")
-        
+    if serving and not prepare(app):
+        print("❌ Falha ao conectar ao banco de dados")
+    else:
         # Iniciar aplicação
+        if serving:
+            print(f"⏱️ Inicialização em {time.perf_counter() - _started:.2f}s")
         print("🚀 Iniciando servidor Flask na porta 5000...")
         print("📡 API disponível em: http://localhost:5000")
         print("📊 Adminer disponível em: http://localhost:8080")
-        app.run(host='0.0.0.0', port=5000, debug=True)
-    else:
-        print("❌ Falha ao conectar ao banco de dados")
\ No newline at end of file
+        app.run(
+            host='0.0.0.0',
+            port=int(os.getenv('PORT', 5000)),
+            debug=app.config.get('DEBUG', False),
+            use_reloader=use_reloader
+        )
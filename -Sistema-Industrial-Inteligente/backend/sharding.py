@@ -0,0 +1,172 @@
+import contextvars
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import current_app, g, request
+from flask.globals import app_ctx
+from flask_sqlalchemy.session import Session
+from config import engine_options
+
+# Shard ativo no contexto atual (None = banco principal)
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+# Verdadeiro dentro de uma tarefa do gather (thread do executor dos shards)
+_in_gather = contextvars.ContextVar('in_gather', default=False)
+
+
+def shard_bind_key(name):
+    return f'shard_{name}'
+
+
+def session_scope():
+    """Escopo do db.session: um Session por contexto de app e por shard"""
+    return (id(app_ctx._get_current_object()), _current_shard.get())
+
+
+class ShardSession(Session):
+    """Session do Flask-SQLAlchemy presa ao shard ativo quando foi criada"""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self.shard = _current_shard.get()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.shard is not None:
+            return self._db.engines[shard_bind_key(self.shard)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ShardRouter:
+    """
+    Roteamento de equipamentos/plantas para bancos de dados
+
+    Cada shard é um bind do Flask-SQLAlchemy com o schema completo. Os dados
+    de um equipamento (sensores, leituras, alertas, manutenções) vivem no
+    shard da sua planta (Equipment.location). O banco principal guarda apenas
+    o diretório equipment_shards, que gera ids globais de equipamentos.
+
+    Sem DATABASE_SHARDS configurado, tudo usa o banco principal.
+    """
+
+    def __init__(self):
+        self.shards = []
+        self.plants = {}
+        self._executor = None
+
+    def init_app(self, app):
+        """Registra os shards como binds (chamar antes de db.init_app)"""
+        app.extensions['shard_router'] = self
+        shards = app.config.get('DATABASE_SHARDS', {})
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for name, url in shards.items():
+            binds[shard_bind_key(name)] = {
+                'url': url,
+                **engine_options(url, app.config.get('DB_POOL_SIZE', 5))
+            }
+        app.config['SQLALCHEMY_BINDS'] = binds
+        self.shards = list(shards)
+        self.plants = dict(app.config.get('PLANT_SHARDS', {}))
+        app.before_request(self._route_request)
+        app.teardown_request(self._release_request)
+        if self.shards and self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self.shards),
+                thread_name_prefix='shard-gather'
+            )
+
+    @property
+    def enabled(self):
+        return bool(self.shards)
+
+    @property
+    def current(self):
+        return _current_shard.get()
+
+    def shard_for_location(self, location):
+        """Shard dono de uma planta (mapa PLANT_SHARDS ou hash estável)"""
+        if not self.enabled:
+            return None
+        if location in self.plants:
+            return self.plants[location]
+        digest = hashlib.md5((location or '').encode()).digest()
+        return self.shards[int.from_bytes(digest[:4], 'big') % len(self.shards)]
+
+    def shard_for_equipment(self, equipment_id):
+        if not self.enabled:
+            return None
+        # Import tardio: registry depende de models, que depende deste módulo
+        from registry import metadata_registry
+        equipment = metadata_registry.get_equipment(equipment_id)
+        return equipment.shard if equipment is not None else None
+
+    @contextmanager
+    def use_shard(self, name):
+        """Direciona db.session / Model.query para o shard informado"""
+        if name == _current_shard.get():
+            yield
+            return
+        token = _current_shard.set(name)
+        try:
+            yield
+        finally:
+            # Fecha a sessão do shard antes de voltar ao escopo anterior
+            current_app.extensions['sqlalchemy'].session.remove()
+            _current_shard.reset(token)
+
+    def _route_request(self):
+        """Rotas com <equipment_id> vão direto para o shard do equipamento"""
+        equipment_id = (request.view_args or {}).get('equipment_id')
+        if not self.enabled or equipment_id is None:
+            return
+        shard = self.shard_for_equipment(equipment_id)
+        if shard is not None:
+            g.shard_token = _current_shard.set(shard)
+
+    def _release_request(self, exc=None):
+        token = g.pop('shard_token', None)
+        if token is not None:
+            current_app.extensions['sqlalchemy'].session.remove()
+            _current_shard.reset(token)
+
+    def engines(self):
+        """Pares (shard, engine) de todos os bancos com dados de equipamentos"""
+        db = current_app.extensions['sqlalchemy']
+        if not self.enabled:
+            return [(None, db.engine)]
+        return [(name, db.engines[shard_bind_key(name)]) for name in self.shards]
+
+    def gather(self, func, *args, **kwargs):
+        """
+        Executa func em todos os shards em paralelo (scatter-gather)
+
+        Chamadas aninhadas (de dentro de uma tarefa do gather) rodam em série
+        na própria thread: esperar pelo executor ocupado causaria deadlock.
+
+        Returns:
+            lista de (shard, resultado) na ordem dos shards
+        """
+        if not self.enabled:
+            return [(None, func(*args, **kwargs))]
+
+        if _in_gather.get():
+            results = []
+            for name in self.shards:
+                with self.use_shard(name):
+                    results.append((name, func(*args, **kwargs)))
+            return results
+
+        app = current_app._get_current_object()
+
+        def _run(name):
+            token = _in_gather.set(True)
+            try:
+                with app.app_context(), self.use_shard(name):
+                    return func(*args, **kwargs)
+            finally:
+                _in_gather.reset(token)
+
+        futures = [(name, self._executor.submit(_run, name)) for name in self.shards]
+        return [(name, future.result()) for name, future in futures]
+
+
+shard_router = ShardRouter()
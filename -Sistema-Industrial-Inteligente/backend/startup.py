@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from sqlalchemy import inspect, text
+from alert_analytics import rebuild_alert_stats
+from models import db, Alert, AlertStat
+from registry import metadata_registry
+
+SCHEMA_TABLE = 'schema_version'
+
+
+def wait_for_db(app, timeout=60, initial_delay=0.1, max_delay=2.0):
+    """Aguarda o banco de dados com backoff exponencial"""
+    print("🔄 Aguardando banco de dados...")
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with app.app_context():
+                with db.engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+            print(f"✅ Banco de dados conectado! (tentativa {attempt})")
+            return True
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"❌ Banco indisponível após {attempt} tentativas: {str(e)[:50]}")
+                return False
+            print(f"⏳ Tentativa {attempt}: {str(e)[:50]}")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+
+def warm_connection_pool(app):
+    """Abre antecipadamente as conexões do pool (de cada shard) para a primeira requisição"""
+    size = app.config.get('DB_POOL_SIZE', 5)
+    with app.app_context():
+        connections = []
+        try:
+            for engine in db.engines.values():
+                # Pools sem tamanho (SQLite em memória) mantêm uma única conexão
+                pooled = callable(getattr(engine.pool, 'size', None))
+                for _ in range(size if pooled else 1):
+                    connections.append(engine.connect())
+        finally:
+            for conn in connections:
+                conn.close()
+    return len(connections)
+
+
+def schema_version():
+    """Hash das definições de tabelas dos modelos"""
+    digest = hashlib.sha1()
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f'{column.name}:{column.type}:{column.nullable}'.encode())
+    return digest.hexdigest()
+
+
+def ensure_schema(app):
+    """
+    Cria as tabelas apenas quando a versão do schema mudou
+
+    Uma única consulta à tabela schema_version substitui a inspeção de todas
+    as tabelas feita por db.create_all() a cada inicialização. Cada banco
+    (principal e shards) recebe o schema completo.
+
+    Tabelas derivadas criadas em um banco já existente (alert_stats) são
+    preenchidas a partir dos dados atuais.
+
+    Returns:
+        True se o schema de algum banco foi (re)criado
+    """
+    version = schema_version()
+    updated = False
+    created = set()
+    with app.app_context():
+        for engine in db.engines.values():
+            tables = _ensure_engine_schema(engine, version)
+            if tables is not None:
+                updated = True
+                created |= tables
+        # alert_stats novo em banco com alertas antigos: backfill dos contadores
+        if AlertStat.__tablename__ in created and Alert.__tablename__ not in created:
+            rows = rebuild_alert_stats()
+            print(f"📈 Contadores de alertas reconstruídos: {rows} linhas")
+    return updated
+
+
+def _ensure_engine_schema(engine, version):
+    """Cria as tabelas se a versão mudou; retorna as tabelas novas (None se atualizado)"""
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(
+                text(f'SELECT version FROM {SCHEMA_TABLE}')
+            ).scalar()
+    except Exception:
+        stored = None
+
+    if stored == version:
+        return None
+
+    existing = set(inspect(engine).get_table_names())
+    db.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} (version VARCHAR(64) NOT NULL)'
+        ))
+        conn.execute(text(f'DELETE FROM {SCHEMA_TABLE}'))
+        conn.execute(
+            text(f'INSERT INTO {SCHEMA_TABLE} (version) VALUES (:version)'),
+            {'version': version}
+        )
+    return set(db.metadata.tables) - existing
+
+
+def prewarm_caches(app):
+    """Carrega o registro de metadados e o motor de regras em segundo plano"""
+    def _prewarm():
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                metadata_registry.all_equipments()
+            # Import pesado (motor de inferência) fora do caminho da primeira requisição
+            import expert_system  # noqa: F401
+        except Exception as e:
+            print(f"⚠️ Falha ao pré-aquecer caches: {e}")
+            return
+        print(f"🔥 Caches pré-aquecidos em {time.perf_counter() - started:.2f}s")
+
+    thread = threading.Thread(target=_prewarm, name='prewarm-caches', daemon=True)
+    thread.start()
+    return thread
@@ -27,12 +27,12 @@ export const Alerts = () => {
     }
   };
 
-  const handleAcknowledge = async (alertId: number) => {
+  const handleAcknowledge = async (alertId: number, shard?: string | null) => {
     const user = prompt('Digite seu nome:');
     if (!user) return;
 
     try {
-      await apiService.acknowledgeAlert(alertId, user);
+      await apiService.acknowledgeAlert(alertId, user, shard);
       fetchAlerts();
     } catch (err) {
       alert('Erro ao reconhecer alerta: ' + err.message);
@@ -164,7 +164,7 @@ export const Alerts = () => {
           <div style={{ display: 'flex', flexDirection: 'column', gap: '12px' }}>
             {alerts.map((alert) => (
               <div
-                key={alert.id}
+                key={`${alert.shard ?? ''}-${alert.id}`}
                 style={{
                   ...styles.alertCard,
                   background: alert.severity === 'critical' ? '#ffe5e5' :
@@ -213,7 +213,7 @@ export const Alerts = () => {
                 {!alert.is_acknowledged && (
                   <button
                     className="btn btn-success"
-                    onClick={() => handleAcknowledge(alert.id)}
+                    onClick={() => handleAcknowledge(alert.id, alert.shard)}
                     style={{ alignSelf: 'flex-start' }}
                   >
                     <CheckCircle size={16} />
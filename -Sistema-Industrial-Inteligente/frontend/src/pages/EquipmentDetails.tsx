@@ -29,7 +29,10 @@ export const EquipmentDetails = () => {
     try {
       setSimulating(true);
       const response = await apiService.simulateReadings(id);
-      alert(`Simulação concluída!\n${response.data.alerts_generated} alerta(s) gerado(s)`);
+      const { alerts_generated } = response.data;
+      alert(alerts_generated === null
+        ? 'Simulação concluída!\nAnálise enfileirada, os alertas aparecerão em instantes'
+        : `Simulação concluída!\n${alerts_generated} alerta(s) gerado(s)`);
       fetchData();
     } catch (err) {
       alert('Erro na simulação: ' + err.message);
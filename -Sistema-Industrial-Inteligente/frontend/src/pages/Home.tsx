@@ -191,7 +191,7 @@ export const Home = () => {
               </p>
             ) : (
               recent_alerts.slice(0, 10).map((alert) => (
-                <div key={alert.id} style={styles.alertItem}>
+                <div key={`${alert.shard ?? ''}-${alert.id}`} style={styles.alertItem}>
                   <div style={{
                     width: '4px',
                     background: alert.severity === 'critical' ? '#dc3545' :
@@ -33,7 +33,11 @@ export const apiService = {
 
   // Alertas
   getAlerts: (params = {}) => api.get('/api/alerts', { params }),
-  acknowledgeAlert: (id, user) => api.post(`/api/alert/${id}/acknowledge`, { user }),
+  acknowledgeAlert: (id, user, shard = null) => api.post(`/api/alert/${id}/acknowledge`, { user, shard }),
+
+  // Analytics
+  getAlertAnalytics: (params = {}) => api.get('/api/analytics/alerts', { params }),
+  getMaintenancePredictions: (params = {}) => api.get('/api/maintenance/predictions', { params }),
 
   // Inicialização
   initSampleData: () => api.post('/api/init-data'),